@@ -4,6 +4,9 @@ import pdfplumber
 import io
 import re
 from datetime import datetime
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
 
 # Page configuration
 st.set_page_config(
@@ -12,102 +15,156 @@ st.set_page_config(
     layout="centered"
 )
 
-class SimplePDFConverter:
-    def __init__(self):
-        self.tables = []
-        self.metadata = {}
+# Patterns used while cleaning tables and reading document info
+_WS_RE = re.compile(r'\s+')
+_COMPANY_RE = re.compile(r'Name in Bank Account\s*:\s*([^\n]+)')
+_PERIOD_RE = re.compile(r'Statement for\s+(\d{4}-\d{2}-\d{2})\s+to\s+(\d{4}-\d{2}-\d{2})')
+
+# Detect tables from ruling lines only, matching how statements are drawn
+_TABLE_SETTINGS = {
+    'vertical_strategy': 'lines',
+    'horizontal_strategy': 'lines'
+}
+
+# Header row style for every sheet, matching pandas' to_excel header
+_HEADER_FONT = Font(bold=True)
+_HEADER_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+_HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+
+def clean_table_data(raw_table):
+    """Clean and standardize table data"""
+    if not raw_table or len(raw_table) < 2:
+        return None
     
-    def extract_tables_from_pdf(self, pdf_file):
-        """Extract all tables from PDF file"""
-        try:
-            with pdfplumber.open(pdf_file) as pdf:
-                full_text = ""
-                all_tables = []
-                
-                # Extract text and tables from all pages
-                for page_num, page in enumerate(pdf.pages):
-                    # Get text
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += page_text + "\n"
-                    
-                    # Extract tables
-                    tables = page.extract_tables()
-                    if tables:
-                        for table_idx, table in enumerate(tables):
-                            if table and len(table) > 1:  # Ensure table has content
-                                all_tables.append({
-                                    'page': page_num + 1,
-                                    'table_idx': table_idx + 1,
-                                    'data': table
-                                })
-                
-                # Clean and process tables
-                self.tables = []
-                for table_info in all_tables:
-                    cleaned_data = self.clean_table_data(table_info['data'])
-                    if cleaned_data:
-                        self.tables.append({
-                            'name': f"Page_{table_info['page']}_Table_{table_info['table_idx']}",
-                            'data': cleaned_data,
-                            'rows': len(cleaned_data) - 1,  # Exclude header
-                            'columns': len(cleaned_data[0]) if cleaned_data else 0
-                        })
-                
-                # Extract basic metadata
-                self.metadata = self.extract_basic_info(full_text, pdf_file.name)
-                
-                return True, f"Successfully extracted {len(self.tables)} tables"
-                
-        except Exception as e:
-            return False, f"Error processing PDF: {str(e)}"
+    cleaned_table = []
+    for row in raw_table:
+        if row and any(cell and str(cell).strip() for cell in row):
+            # Clean whitespace and formatting of each cell
+            cleaned_table.append([
+                _WS_RE.sub(' ', str(cell).strip()) if cell is not None else ''
+                for cell in row
+            ])
     
-    def clean_table_data(self, raw_table):
-        """Clean and standardize table data"""
-        if not raw_table or len(raw_table) < 2:
-            return None
+    return cleaned_table if len(cleaned_table) > 1 else None
+
+def extract_basic_info(text, filename):
+    """Extract basic document information"""
+    info = {
+        'filename': filename,
+        'processed_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+    
+    # Try to detect if it's a Shopee document
+    lowered = text.lower()
+    if any(keyword in lowered for keyword in ['shopee', 'income statement', 'payout']):
+        info['document_type'] = 'Shopee Income Statement'
         
-        cleaned_table = []
-        for row in raw_table:
-            if row and any(cell and str(cell).strip() for cell in row):
-                # Clean each cell
-                cleaned_row = []
-                for cell in row:
-                    if cell is None:
-                        cleaned_row.append('')
-                    else:
-                        # Clean whitespace and formatting
-                        cell_str = str(cell).strip()
-                        cell_str = re.sub(r'\s+', ' ', cell_str)
-                        cleaned_row.append(cell_str)
-                cleaned_table.append(cleaned_row)
+        # Extract company name
+        company_match = _COMPANY_RE.search(text)
+        if company_match:
+            info['company'] = company_match.group(1).strip()
         
-        return cleaned_table if len(cleaned_table) > 1 else None
+        # Extract period
+        period_match = _PERIOD_RE.search(text)
+        if period_match:
+            info['period'] = f"{period_match.group(1)} to {period_match.group(2)}"
+    else:
+        info['document_type'] = 'General PDF Document'
     
-    def extract_basic_info(self, text, filename):
-        """Extract basic document information"""
-        info = {
-            'filename': filename,
-            'processed_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+    return info
+
+# Bounded so a public app does not keep every upload's tables in memory
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def _parse_pdf(pdf_bytes, filename):
+    """Parse PDF bytes into (metadata, tables), cached across reruns"""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        text_parts = []
+        all_tables = []
         
-        # Try to detect if it's a Shopee document
-        if any(keyword in text.lower() for keyword in ['shopee', 'income statement', 'payout']):
-            info['document_type'] = 'Shopee Income Statement'
+        # Extract text and tables from all pages
+        for page_num, page in enumerate(pdf.pages):
+            # Get text
+            page_text = page.extract_text()
+            if page_text:
+                text_parts.append(page_text)
             
-            # Extract company name
-            company_match = re.search(r'Name in Bank Account\s*:\s*([^\n]+)', text)
-            if company_match:
-                info['company'] = company_match.group(1).strip()
+            # Extract tables
+            tables = page.extract_tables(table_settings=_TABLE_SETTINGS)
+            if tables:
+                for table_idx, table in enumerate(tables):
+                    if table and len(table) > 1:  # Ensure table has content
+                        all_tables.append({
+                            'page': page_num + 1,
+                            'table_idx': table_idx + 1,
+                            'data': table
+                        })
             
-            # Extract period
-            period_match = re.search(r'Statement for\s+(\d{4}-\d{2}-\d{2})\s+to\s+(\d{4}-\d{2}-\d{2})', text)
-            if period_match:
-                info['period'] = f"{period_match.group(1)} to {period_match.group(2)}"
-        else:
-            info['document_type'] = 'General PDF Document'
+            # Drop the page's cached layout objects and text map before moving on
+            page.flush_cache()
+            page.get_textmap.cache_clear()
         
-        return info
+        full_text = "\n".join(text_parts)
+    
+    # Clean and process tables
+    cleaned_tables = []
+    for table_info in all_tables:
+        cleaned_data = clean_table_data(table_info['data'])
+        if cleaned_data:
+            cleaned_tables.append({
+                'name': f"Page_{table_info['page']}_Table_{table_info['table_idx']}",
+                'data': cleaned_data,
+                'rows': len(cleaned_data) - 1,  # Exclude header
+                'columns': len(cleaned_data[0]) if cleaned_data else 0
+            })
+    
+    # Extract basic metadata
+    metadata = extract_basic_info(full_text, filename)
+    
+    return metadata, cleaned_tables
+
+def _append_sheet(workbook, sheet_name, rows):
+    """Write rows to a new sheet, styling the first row as the header"""
+    worksheet = workbook.create_sheet(title=sheet_name)
+    
+    # Build every cell before appending: a write-only sheet streams XML as
+    # rows arrive, so a bad value raised mid-table would leave an unclosed
+    # row behind and corrupt the saved file
+    try:
+        cells = [[WriteOnlyCell(worksheet, value=value) for value in row] for row in rows]
+    except Exception:
+        workbook.remove(worksheet)
+        raise
+    
+    for cell in cells[0]:
+        cell.font = _HEADER_FONT
+        cell.border = _HEADER_BORDER
+        cell.alignment = _HEADER_ALIGNMENT
+    for row in cells:
+        worksheet.append(row)
+
+class SimplePDFConverter:
+    def __init__(self):
+        self.tables = []
+        self.metadata = {}
+    
+    def extract_tables_from_pdf(self, pdf_bytes, filename):
+        """Extract all tables from PDF file contents"""
+        try:
+            # Raw bytes double as the cache key, so repeated runs skip re-parsing
+            self.metadata, self.tables = _parse_pdf(pdf_bytes, filename)
+            
+            # A cached parse keeps its original timestamp, so refresh it per conversion
+            self.metadata['processed_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            
+            return True, f"Successfully extracted {len(self.tables)} tables"
+            
+        except Exception as e:
+            return False, f"Error processing PDF: {str(e)}"
     
     def create_excel_file(self):
         """Create Excel file with all extracted tables"""
@@ -117,31 +174,29 @@ class SimplePDFConverter:
         output = io.BytesIO()
         
         try:
-            # Use openpyxl engine instead of xlsxwriter to avoid compatibility issues
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                
-                # Create document info sheet
-                if self.metadata:
-                    info_data = [[k.replace('_', ' ').title(), v] for k, v in self.metadata.items()]
-                    df_info = pd.DataFrame(info_data, columns=['Property', 'Value'])
-                    df_info.to_excel(writer, sheet_name='Document_Info', index=False)
-                
-                # Create sheet for each table
-                for table in self.tables:
-                    try:
-                        # Convert to DataFrame
-                        df = pd.DataFrame(table['data'][1:], columns=table['data'][0])
-                        
-                        # Clean sheet name (Excel limitations)
-                        sheet_name = table['name'][:31].replace('/', '_').replace('\\', '_')
-                        
-                        # Write to Excel
-                        df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        
-                    except Exception as e:
-                        st.warning(f"Could not process table {table['name']}: {str(e)}")
-                        continue
-        
+            # Use openpyxl instead of xlsxwriter to avoid compatibility issues;
+            # write-only mode streams rows without building DataFrames
+            workbook = Workbook(write_only=True)
+            
+            # Create document info sheet
+            if self.metadata:
+                info_data = [[k.replace('_', ' ').title(), v] for k, v in self.metadata.items()]
+                _append_sheet(workbook, 'Document_Info', [['Property', 'Value']] + info_data)
+            
+            # Create sheet for each table
+            for table in self.tables:
+                try:
+                    # Clean sheet name (Excel limitations)
+                    sheet_name = table['name'][:31].replace('/', '_').replace('\\', '_')
+                    
+                    # Write to Excel
+                    _append_sheet(workbook, sheet_name, table['data'])
+                    
+                except Exception as e:
+                    st.warning(f"Could not process table {table['name']}: {str(e)}")
+                    continue
+            
+            workbook.save(output)
             output.seek(0)
             return output
             
@@ -180,9 +235,12 @@ def main():
         # Process button
         if st.button("🔄 Convert to Excel", type="primary"):
             with st.spinner("Processing PDF... This may take a moment"):
+                # Read the upload once and work from the in-memory bytes
+                pdf_bytes = uploaded_file.getvalue()
+                
                 # Create converter and process file
                 converter = SimplePDFConverter()
-                success, message = converter.extract_tables_from_pdf(uploaded_file)
+                success, message = converter.extract_tables_from_pdf(pdf_bytes, uploaded_file.name)
                 
                 if success:
                     st.success(message)